@@ -1,6 +1,9 @@
 """
 Configuration pour l'API Gateway FastAPI - COMPATIBILITÉ FRONTEND
 """
+import os
+import sys
+
 from decouple import config
 
 # Services backend avec mapping de compatibilité
@@ -32,6 +35,12 @@ SERVICES = {
     }
 }
 
+# Préfixes de routes des services, aplatis en (préfixe, url), du plus long au plus court
+SERVICE_PREFIXES = tuple(sorted(
+    ((prefix, service["url"]) for service in SERVICES.values() for prefix in service["routes"]),
+    key=lambda entry: -len(entry[0])
+))
+
 # Mapping de compatibilité frontend existant
 LEGACY_ROUTE_MAPPING = {
     # Anciennes routes → Nouveaux services
@@ -239,14 +248,49 @@ LEGACY_ROUTE_MAPPING = {
     "/api/ingredients/par_ouvrage/": ("library", "/api/ingredients/par_ouvrage/"),
 }
 
+# Routes exactes résolues une fois : chemin -> (url du service, chemin cible). Les clés
+# sont internées ; les routes à paramètres ({id}...) sont gérées par le router
+RESOLVED_EXACT = {
+    sys.intern(path): (SERVICES[service_name]["url"], target_path)
+    for path, (service_name, target_path) in LEGACY_ROUTE_MAPPING.items()
+    if service_name in SERVICES and "{" not in path
+}
+
 # Configuration JWT
 JWT_SECRET_KEY = config("JWT_SECRET_KEY")
 JWT_ALGORITHM = config("JWT_ALGORITHM", default="HS256")
+JWT_CACHE_TTL = config("JWT_CACHE_TTL", default=5.0, cast=float)
+JWT_CACHE_MAXSIZE = config("JWT_CACHE_MAXSIZE", default=10000, cast=int)
 
 # Configuration serveur
 GATEWAY_HOST = config("GATEWAY_HOST", default="0.0.0.0")
 GATEWAY_PORT = config("GATEWAY_PORT", default=8000, cast=int)
 DEBUG = config("DEBUG", default=False, cast=bool)
+# Nombre de processus Uvicorn (ignoré en DEBUG, où le rechargement automatique impose un seul processus)
+GATEWAY_WORKERS = config("GATEWAY_WORKERS", default=os.cpu_count() or 1, cast=int)
+
+# Configuration du client HTTP partagé vers les services backend
+PROXY_TIMEOUT = config("PROXY_TIMEOUT", default=30.0, cast=float)
+PROXY_CONNECT_TIMEOUT = config("PROXY_CONNECT_TIMEOUT", default=5.0, cast=float)
+# HTTP/2 négocié via TLS (ALPN) ; les backends en http:// restent en HTTP/1.1
+PROXY_HTTP2 = config("PROXY_HTTP2", default=True, cast=bool)
+PROXY_MAX_CONNECTIONS = config("PROXY_MAX_CONNECTIONS", default=500, cast=int)
+PROXY_MAX_KEEPALIVE = config("PROXY_MAX_KEEPALIVE", default=100, cast=int)
+PROXY_KEEPALIVE_EXPIRY = config("PROXY_KEEPALIVE_EXPIRY", default=30.0, cast=float)
+
+# Timeout (secondes) des appels /health/ vers les services backend
+HEALTH_CHECK_TIMEOUT = config("HEALTH_CHECK_TIMEOUT", default=5.0, cast=float)
+# Durée (secondes) pendant laquelle le résultat du health check d'un service est réutilisé
+# tel quel (0 = désactivé : chaque appel interroge les services)
+HEALTH_CACHE_TTL = config("HEALTH_CACHE_TTL", default=2.0, cast=float)
+# Âge maximal (secondes) d'un résultat servi pendant son rafraîchissement en arrière-plan ;
+# au-delà, /health/ attend la nouvelle sonde
+HEALTH_MAX_STALE = config("HEALTH_MAX_STALE", default=2 * HEALTH_CACHE_TTL, cast=float)
+
+# Nombre de chemins dont la résolution de service est mémorisée
+ROUTE_CACHE_SIZE = config("ROUTE_CACHE_SIZE", default=4096, cast=int)
+# Nombre de chemins inconnus (404) mémorisés, dans un cache séparé
+ROUTE_NEGATIVE_CACHE_SIZE = config("ROUTE_NEGATIVE_CACHE_SIZE", default=1024, cast=int)
 
 # Routes publiques (pas d'authentification requise)
 PUBLIC_ROUTES = [
@@ -0,0 +1,55 @@
+"""
+Interception ASGI des sondes de santé (Kubernetes, load balancers)
+"""
+from typing import Any, Awaitable, Callable, Dict, Iterable, Tuple
+import orjson
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+# Vérification de santé : (status HTTP, corps JSON)
+HealthCheck = Callable[[], Awaitable[Tuple[int, Dict[str, Any]]]]
+
+
+class HealthCheckInterceptor:
+    """
+    Middleware ASGI pur qui répond aux sondes de santé avant le reste de la pile
+
+    Les sondes n'envoient pas de header Origin : elles sont servies directement, sans
+    traverser CORS, le routage FastAPI ni la validation de réponse. Une requête navigateur
+    (avec Origin) continue vers l'application pour recevoir ses headers CORS.
+    """
+
+    def __init__(self, app: ASGIApp, check: HealthCheck,
+                 paths: Iterable[str] = ("/health/", "/healthz", "/readyz")):
+        self.app = app
+        self.check = check
+        self.paths = frozenset(paths)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] != "http"
+            or scope["path"] not in self.paths
+            or any(name == b"origin" for name, _ in scope["headers"])
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        if scope["method"] != "GET":
+            await self._send(send, 405, b'{"detail":"Method Not Allowed"}', [(b"allow", b"GET")])
+            return
+
+        status_code, health_data = await self.check()
+        await self._send(send, status_code, orjson.dumps(health_data))
+
+    @staticmethod
+    async def _send(send: Send, status_code: int, body: bytes, extra_headers: Iterable[Tuple[bytes, bytes]] = ()) -> None:
+        """Envoie une réponse JSON complète en deux messages ASGI"""
+        await send({
+            "type": "http.response.start",
+            "status": status_code,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                *extra_headers
+            ]
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,37 @@
+"""
+Outils communs aux scripts de test d'intégration (test_*_integration.py)
+"""
+import asyncio
+import os
+from typing import Awaitable, Callable, TypeVar
+import httpx
+
+# TEST_VERBOSE=0 : chaque script n'affiche plus que ses résumés et ses échecs
+VERBOSE = os.getenv("TEST_VERBOSE", "1") != "0"
+
+# Erreurs réseau transitoires (service encore en démarrage) rejouées par retry
+RETRY_ERRORS = (httpx.ConnectError, httpx.ReadTimeout)
+
+T = TypeVar("T")
+
+async def retry(fn: Callable[[], Awaitable[T]], *, attempts: int = 3, base: float = 0.1) -> T:
+    """Rejoue `fn` après une erreur réseau transitoire, en doublant l'attente à chaque essai"""
+    for attempt in range(attempts - 1):
+        try:
+            return await fn()
+        except RETRY_ERRORS:
+            await asyncio.sleep(base * 2 ** attempt)
+    return await fn()
+
+def make_client(max_keepalive_connections: int, max_connections: int) -> httpx.AsyncClient:
+    """
+    Client HTTP partagé par toute une campagne de tests (pool de connexions keep-alive)
+
+    HTTP/2 multiplexe les sondes parallèles sur une connexion en HTTPS ; en clair, httpx
+    reste en HTTP/1.1 keep-alive.
+    """
+    return httpx.AsyncClient(
+        http2=True,
+        timeout=10.0,
+        limits=httpx.Limits(max_keepalive_connections=max_keepalive_connections, max_connections=max_connections)
+    )
@@ -2,33 +2,80 @@
 API Gateway FastAPI avec compatibilité frontend existant et CORS configuré pour le frontend
 """
 import asyncio
+import hashlib
 import logging
-from typing import Dict, Any
-from fastapi import FastAPI, Request, HTTPException, status, Depends
-from fastapi.responses import JSONResponse, Response
+import string
+import sys
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import AsyncIterator, Dict, Any, Literal, Optional
+from fastapi import FastAPI, HTTPException, status
+from fastapi.responses import ORJSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.exceptions import HTTPException as StarletteHTTPException
+from starlette.requests import Request
+from starlette.types import Receive, Scope, Send
+from starlette.websockets import WebSocketClose
 import httpx
+import marisa_trie
+import orjson
 import uvicorn
 
-from config import SERVICES, LEGACY_ROUTE_MAPPING, GATEWAY_HOST, GATEWAY_PORT, DEBUG
-from middleware import JWTMiddleware
+from config import (
+    SERVICES, SERVICE_PREFIXES, LEGACY_ROUTE_MAPPING, RESOLVED_EXACT, GATEWAY_HOST, GATEWAY_PORT, DEBUG, GATEWAY_WORKERS,
+    PROXY_TIMEOUT, PROXY_CONNECT_TIMEOUT, PROXY_HTTP2, PROXY_MAX_CONNECTIONS, PROXY_MAX_KEEPALIVE, PROXY_KEEPALIVE_EXPIRY,
+    ROUTE_CACHE_SIZE, ROUTE_NEGATIVE_CACHE_SIZE, HEALTH_CHECK_TIMEOUT, HEALTH_CACHE_TTL,
+    HEALTH_MAX_STALE
+)
+from middleware import JWTMiddleware, CurrentUser
+from health_interceptor import HealthCheckInterceptor
 
 # Configuration du logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Cycle de vie de l'application : un seul client HTTP partagé pour tous les appels
+    vers les services backend (pool de connexions + keep-alive)
+    """
+    app.state.http_client = httpx.AsyncClient(
+        http2=PROXY_HTTP2,
+        timeout=httpx.Timeout(PROXY_TIMEOUT, connect=PROXY_CONNECT_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=PROXY_MAX_CONNECTIONS,
+            max_keepalive_connections=PROXY_MAX_KEEPALIVE,
+            keepalive_expiry=PROXY_KEEPALIVE_EXPIRY
+        )
+    )
+    try:
+        yield
+    finally:
+        await app.state.http_client.aclose()
+
 # Création de l'application FastAPI
 app = FastAPI(
     title="Beenaya API Gateway",
     description="Point d'entrée centralisé pour l'architecture SOA avec compatibilité frontend",
     version="1.0.0",
     docs_url="/docs" if DEBUG else None,
-    redoc_url="/redoc" if DEBUG else None
+    redoc_url="/redoc" if DEBUG else None,
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # ✅ CONFIGURATION CORS POUR LE FRONTEND
-from fastapi.middleware.cors import CORSMiddleware
-
+# Pile ASGI, de l'extérieur vers l'intérieur :
+#   ServerErrorMiddleware -> HealthCheckInterceptor -> CORSMiddleware -> ExceptionMiddleware
+#   -> routes FastAPI / ProxyASGI
+# Les deux middlewares applicatifs sont des middlewares ASGI purs : la pile reste plate.
+# HealthCheckInterceptor (ajouté plus bas, avec l'endpoint /health/) ne coûte qu'une
+# comparaison de chemin aux autres requêtes. Toute logique transverse du proxy (logs,
+# métriques...) va dans ProxyASGI plutôt que dans une couche supplémentaire.
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[
@@ -45,84 +92,240 @@ app.add_middleware(
 )
 
 
+@app.exception_handler(StarletteHTTPException)
+async def http_exception_handler(request: Request, exc: StarletteHTTPException) -> Response:
+    """Erreurs HTTP (401, 404, 503... du proxy) sérialisées avec orjson, même format que FastAPI"""
+    headers = getattr(exc, "headers", None)
+    if exc.status_code in (status.HTTP_204_NO_CONTENT, status.HTTP_304_NOT_MODIFIED) or exc.status_code < 200:
+        return Response(status_code=exc.status_code, headers=headers)
+    return ORJSONResponse({"detail": exc.detail}, status_code=exc.status_code, headers=headers)
+
+
+class _UnknownRoute(LookupError):
+    """Chemin sans service cible ; porte la classification publique/protégée de la requête"""
+    
+    def __init__(self, kind: str):
+        super().__init__(kind)
+        self.kind = kind
+
+
+class _TemplateNode:
+    """Nœud du trie des routes à paramètres ({id}, {tenant_id}...), découpées par segment"""
+    
+    __slots__ = ("children", "wildcard", "leaf")
+    
+    def __init__(self):
+        self.children: Dict[str, "_TemplateNode"] = {}
+        self.wildcard: Optional["_TemplateNode"] = None
+        # (service_url, fragments littéraux du chemin cible, index des valeurs capturées
+        # à insérer entre ces fragments)
+        self.leaf: Optional[tuple[str, tuple[str, ...], tuple[int, ...]]] = None
+
+
 class ServiceRouter:
     """Router intelligent avec compatibilité frontend existant"""
     
     def __init__(self):
         self.services = SERVICES
         self.legacy_mapping = LEGACY_ROUTE_MAPPING
+        self._compile_routes()
+        # URLs de health check complètes, calculées une fois
+        self._health_urls = [(name, f"{cfg['url']}{cfg['health']}") for name, cfg in self.services.items()]
+        # Derniers résultats de health check par service : (instant monotonic, résultat)
+        self._health_cache: Dict[str, tuple[float, Dict[str, Any]]] = {}
+        # Sondes de health check en cours, une au plus par service
+        self._health_refresh: Dict[str, "asyncio.Future[Dict[str, Any]]"] = {}
+        # Classifications mémorisées dans un LRU borné. Les chemins inconnus ont leur propre
+        # LRU (plus petit) : une rafale de 404 n'évince pas les routes valides
+        self._classify_cached = lru_cache(maxsize=ROUTE_CACHE_SIZE)(self._classify_path)
+        self._negative_cache: "OrderedDict[str, None]" = OrderedDict()
     
-    def resolve_service(self, path: str) -> tuple[str, str]:
+    def _compile_routes(self) -> None:
         """
-        Résout intelligemment le service cible
-        1. Vérifie d'abord le mapping de compatibilité
-        2. Puis la configuration normale des services
+        Compile les routes en une seule passe, en séparant routes statiques et dynamiques
+        
+        - self._exact_routes : routes statiques (RESOLVED_EXACT, précalculée dans config.py)
+        - self._template_trie : routes à paramètres ({id}...), trie par segment de chemin
+        - self._prefix_entries : routes dynamiques, préfixe -> (rang, service_url, longueur_du_préfixe,
+          nouveau_préfixe). Les préfixes de LEGACY_ROUTE_MAPPING viennent d'abord, dans l'ordre de
+          déclaration, puis les préfixes de SERVICES du plus long au plus court : si plusieurs
+          préfixes correspondent, le rang le plus bas l'emporte.
+        - self._prefix_trie : trie marisa (implémenté en C) sur ces préfixes
         """
-        logger.info(f"🔍 RESOLVE_SERVICE: Début résolution pour path='{path}'")
+        self._exact_routes = RESOLVED_EXACT
+        self._template_trie = _TemplateNode()
+        entries: Dict[str, tuple[int, str, int, str]] = {}
+        rank = 0
+        for legacy_route, (service_name, new_route) in self.legacy_mapping.items():
+            rank += 1
+            service = self.services.get(service_name)
+            if service is None:
+                logger.error("❌ ROUTER: Service '%s' non trouvé dans SERVICES (route '%s')", service_name, legacy_route)
+                continue
+            service_url = service["url"]
+            if "{" in legacy_route:
+                self._insert_template(legacy_route, service_url, new_route)
+                continue
+            legacy_route_stripped = sys.intern(legacy_route.rstrip('/'))
+            if legacy_route_stripped not in entries:
+                entries[legacy_route_stripped] = (rank, service_url, len(legacy_route_stripped), new_route.rstrip('/'))
+        # Préfixes des services, du plus spécifique au plus général : le chemin est relayé
+        # tel quel (nouveau préfixe = préfixe)
+        for route_prefix, service_url in SERVICE_PREFIXES:
+            rank += 1
+            if route_prefix not in entries:
+                entries[sys.intern(route_prefix)] = (rank, service_url, len(route_prefix), route_prefix)
         
-        # 1. Vérification mapping de compatibilité
-        logger.info(f"🔍 STEP 1: Vérification mapping exact pour '{path}'")
-        if path in self.legacy_mapping:
-            service_name, target_path = self.legacy_mapping[path]
-            logger.info(f"✅ STEP 1: Mapping exact trouvé - service='{service_name}', target='{target_path}'")
-            if service_name in self.services:
-                service_url = self.services[service_name]["url"]
-                logger.info(f"✅ STEP 1: Service trouvé - service_url='{service_url}'")
-                logger.info(f"✅ RESOLVE_SERVICE: Retour STEP 1 - url='{service_url}', path='{target_path}'")
-                return service_url, target_path
+        # Un préfixe qui en prolonge un autre de rang plus bas n'est jamais retenu : inutile
+        # de le garder dans le trie (cas de toutes les routes détaillées d'une même ressource)
+        trie = marisa_trie.Trie(entries)
+        self._prefix_entries = {
+            prefix: entry for prefix, entry in entries.items()
+            if all(entries[shorter][0] > entry[0] for shorter in trie.prefixes(prefix) if shorter != prefix)
+        }
+        self._prefix_trie = marisa_trie.Trie(self._prefix_entries)
+    
+    def _insert_template(self, legacy_route: str, service_url: str, new_route: str) -> None:
+        """Ajoute une route à paramètres au trie ; la première déclarée l'emporte"""
+        node = self._template_trie
+        params = []
+        for segment in legacy_route.split("/"):
+            if segment.startswith("{") and segment.endswith("}"):
+                params.append(segment[1:-1])
+                if node.wildcard is None:
+                    node.wildcard = _TemplateNode()
+                node = node.wildcard
             else:
-                logger.error(f"❌ STEP 1: Service '{service_name}' non trouvé dans SERVICES")
-        else:
-            logger.info(f"ℹ️ STEP 1: Pas de mapping exact trouvé pour '{path}'")
+                node = node.children.setdefault(segment, _TemplateNode())
+        if node.leaf is None:
+            node.leaf = (service_url, *self._compile_target(new_route, params))
+    
+    @staticmethod
+    def _compile_target(new_route: str, params: list[str]) -> tuple[tuple[str, ...], tuple[int, ...]]:
+        """
+        Découpe le gabarit cible une fois pour toutes : '/api/tiers/{id}/vue_360/' devient
+        ('/api/tiers/', '/vue_360/') et l'index de 'id' parmi les paramètres du chemin
+        """
+        literals = [""]
+        indices = []
+        for literal, field_name, _, _ in string.Formatter().parse(new_route):
+            literals[-1] += literal
+            if field_name is not None:
+                indices.append(params.index(field_name))
+                literals.append("")
+        return tuple(sys.intern(literal) for literal in literals), tuple(indices)
+    
+    def _match_template(self, path: str) -> Optional[tuple[str, str]]:
+        """Cherche une route à paramètres correspondant exactement au chemin"""
+        values: list[str] = []
+        leaf = self._walk_template(self._template_trie, path.split("/"), 0, values)
+        if leaf is None:
+            return None
+        service_url, literals, indices = leaf
+        if len(indices) == 1:
+            # Cas courant : un seul paramètre, la substitution est un simple join
+            return service_url, values[indices[0]].join(literals)
+        pieces = [literals[0]]
+        for index, literal in zip(indices, literals[1:]):
+            pieces.append(values[index])
+            pieces.append(literal)
+        return service_url, "".join(pieces)
+    
+    @classmethod
+    def _walk_template(cls, node: _TemplateNode, segments: list[str], index: int,
+                       values: list[str]) -> Optional[tuple[str, tuple[str, ...], tuple[int, ...]]]:
+        """Parcours segment par segment : littéral d'abord, puis paramètre (segment non vide)"""
+        if index == len(segments):
+            return node.leaf
+        segment = segments[index]
+        child = node.children.get(segment)
+        if child is not None:
+            leaf = cls._walk_template(child, segments, index + 1, values)
+            if leaf is not None:
+                return leaf
+        if node.wildcard is not None and segment:
+            values.append(segment)
+            leaf = cls._walk_template(node.wildcard, segments, index + 1, values)
+            if leaf is not None:
+                return leaf
+            values.pop()
+        return None
+    
+    def _match_prefix(self, path: str) -> Optional[tuple[int, str, int, str]]:
+        """Retourne, parmi les préfixes du chemin, celui déclaré en premier"""
+        prefixes = self._prefix_trie.prefixes(path)
+        if not prefixes:
+            return None
+        return min(map(self._prefix_entries.__getitem__, prefixes))
+    
+    def classify_path(self, path: str, method: str) -> tuple[Literal["public", "private"], Optional[tuple[str, str]]]:
+        """
+        Classe une requête en une seule passe (mémorisée par chemin et méthode) :
+        route publique ou protégée, et (service_url, URL cible complète), None si aucun
+        service ne correspond
+        """
+        try:
+            return self._classify_cached(path, method)
+        except _UnknownRoute as e:
+            return e.kind, None
+    
+    def _classify_path(self, path: str, method: str) -> tuple[Literal["public", "private"], tuple[str, str]]:
+        """Classification non mémorisée ; lève _UnknownRoute pour ne pas occuper le LRU"""
+        kind = "public" if JWTMiddleware.is_public_route(path, method) else "private"
+        resolved = self._lookup(path)
+        if resolved is None:
+            raise _UnknownRoute(kind)
+        service_url, target_path = resolved
+        return kind, (service_url, f"{service_url}{target_path}")
+    
+    def _lookup(self, path: str) -> Optional[tuple[str, str]]:
+        """Table des routes exactes d'abord, puis cache négatif, puis résolution dynamique"""
+        resolved = self._exact_routes.get(path)
+        if resolved is not None:
+            return resolved
         
-        # 2. Vérification mapping par préfixe (pour routes dynamiques)
-        logger.info(f"🔍 STEP 2: Vérification mapping par préfixe pour '{path}'")
-        for legacy_route, (service_name, new_route) in self.legacy_mapping.items():
-            legacy_route_stripped = legacy_route.rstrip('/')
-            logger.debug(f"🔍 STEP 2: Test préfixe '{legacy_route}' (stripped: '{legacy_route_stripped}') vs '{path}'")
-            
-            if path.startswith(legacy_route_stripped):
-                logger.info(f"✅ STEP 2: Préfixe match - route='{legacy_route}', service='{service_name}', new_route='{new_route}'")
-                
-                if service_name in self.services:
-                    # Remplacer le préfixe
-                    new_route_stripped = new_route.rstrip('/')
-                    target_path = path.replace(legacy_route_stripped, new_route_stripped)
-                    service_url = self.services[service_name]["url"]
-                    
-                    logger.info(f"✅ STEP 2: Transformation - '{legacy_route_stripped}' -> '{new_route_stripped}'")
-                    logger.info(f"✅ STEP 2: Path final - '{path}' -> '{target_path}'")
-                    logger.info(f"✅ STEP 2: Service URL - '{service_url}'")
-                    logger.info(f"✅ RESOLVE_SERVICE: Retour STEP 2 - url='{service_url}', path='{target_path}'")
-                    return service_url, target_path
-                else:
-                    logger.error(f"❌ STEP 2: Service '{service_name}' non trouvé dans SERVICES")
+        negative_cache = self._negative_cache
+        if path in negative_cache:
+            negative_cache.move_to_end(path)
+            return None
         
-        logger.info(f"ℹ️ STEP 2: Aucun préfixe match trouvé pour '{path}'")
+        try:
+            return self._resolve(path)
+        except LookupError:
+            negative_cache[path] = None
+            if len(negative_cache) > ROUTE_NEGATIVE_CACHE_SIZE:
+                negative_cache.popitem(last=False)
+            return None
+    
+    def _resolve(self, path: str) -> tuple[str, str]:
+        """
+        Résout le service cible d'un chemin absent de la table des routes exactes
+        1. Routes à paramètres du mapping de compatibilité (trie par segment)
+        2. Préfixes, en une seule recherche dans le trie marisa : mapping de compatibilité
+           d'abord, puis configuration normale des services
         
-        # 3. Configuration normale des services
-        logger.info(f"🔍 STEP 3: Vérification configuration normale des services pour '{path}'")
-        for service_name, config in self.services.items():
-            logger.debug(f"🔍 STEP 3: Test service '{service_name}' - routes: {config['routes']}")
-            for route_prefix in config["routes"]:
-                logger.debug(f"🔍 STEP 3: Test route_prefix '{route_prefix}' vs '{path}'")
-                if path.startswith(route_prefix):
-                    service_url = config["url"]
-                    logger.info(f"✅ STEP 3: Match trouvé - service='{service_name}', route_prefix='{route_prefix}'")
-                    logger.info(f"✅ RESOLVE_SERVICE: Retour STEP 3 - url='{service_url}', path='{path}'")
-                    return service_url, path
+        Raises:
+            LookupError: si aucun service ne correspond
+        """
+        resolved = self._match_template(path)
+        if resolved is not None:
+            logger.debug("✅ RESOLVE_SERVICE: Route à paramètres : '%s' -> %s%s", path, *resolved)
+            return resolved
         
-        logger.error(f"❌ RESOLVE_SERVICE: Aucune route trouvée pour '{path}'")
-        logger.error(f"❌ RESOLVE_SERVICE: LEGACY_MAPPING disponible: {list(self.legacy_mapping.keys())}")
-        logger.error(f"❌ RESOLVE_SERVICE: SERVICES disponible: {list(self.services.keys())}")
+        match = self._match_prefix(path)
+        if match is not None:
+            _, service_url, prefix_length, new_prefix = match
+            # Le préfixe est connu : on le remplace par découpage, sans recherche dans le chemin
+            target_path = new_prefix + path[prefix_length:]
+            logger.debug("✅ RESOLVE_SERVICE: Préfixe '%s' -> '%s' : '%s' -> %s%s",
+                         path[:prefix_length], new_prefix, path, service_url, target_path)
+            return service_url, target_path
         
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Aucun service configuré pour le chemin: {path}"
-        )
+        logger.debug("❌ RESOLVE_SERVICE: Aucune route trouvée pour '%s'", path)
+        raise LookupError(path)
     
-    async def health_check_all(self) -> Dict[str, Any]:
-        """Vérifie la santé de tous les services backend"""
+    async def health_check_all(self, client: httpx.AsyncClient) -> Dict[str, Any]:
+        """Vérifie la santé de tous les services backend via le client HTTP partagé"""
         
         health_status = {
             "gateway": {"status": "healthy", "version": "1.0.0"},
@@ -132,35 +335,71 @@ class ServiceRouter:
         
         overall_healthy = True
         
-        async with httpx.AsyncClient(timeout=5.0) as client:
-            tasks = []
-            
-            for service_name, config in self.services.items():
-                health_url = f"{config['url']}{config['health']}"
-                tasks.append(self._check_service_health(client, service_name, health_url))
-            
-            results = await asyncio.gather(*tasks, return_exceptions=True)
-            
-            for service_name, result in zip(self.services.keys(), results):
-                if isinstance(result, Exception):
-                    health_status["services"][service_name] = {
-                        "status": "unreachable",
-                        "error": str(result)
-                    }
-                    overall_healthy = False
-                else:
-                    health_status["services"][service_name] = result
-                    if result["status"] != "healthy":
-                        overall_healthy = False
+        # _check_service_health capture ses propres erreurs : un service en échec
+        # n'annule jamais les vérifications des autres
+        async with asyncio.TaskGroup() as tg:
+            tasks = {
+                service_name: tg.create_task(self._check_service_health(client, service_name, health_url))
+                for service_name, health_url in self._health_urls
+            }
+        
+        for service_name, task in tasks.items():
+            result = task.result()
+            health_status["services"][service_name] = result
+            if result["status"] != "healthy":
+                overall_healthy = False
         
         health_status["gateway"]["overall_status"] = "healthy" if overall_healthy else "degraded"
         return health_status
     
     async def _check_service_health(self, client: httpx.AsyncClient, service_name: str, health_url: str) -> Dict[str, Any]:
-        """Vérifie la santé d'un service individuel"""
+        """
+        Vérifie la santé d'un service individuel (stale-while-revalidate borné)
+        
+        Un résultat de moins de HEALTH_CACHE_TTL est réutilisé tel quel. Jusqu'à HEALTH_MAX_STALE,
+        le dernier résultat est servi immédiatement pendant qu'une seule sonde le rafraîchit en
+        arrière-plan ; au-delà, l'appel attend cette sonde. Des appels concurrents à /health/ ne
+        déclenchent jamais plusieurs sondes par service. HEALTH_CACHE_TTL <= 0 désactive le cache.
+        """
+        if HEALTH_CACHE_TTL <= 0:
+            return await self._probe_service_health(client, health_url)
+        
+        cached = self._health_cache.get(service_name)
+        age = time.monotonic() - cached[0] if cached is not None else None
+        if age is not None and age < HEALTH_CACHE_TTL:
+            return cached[1]
+        
+        refresh = self._health_refresh.get(service_name)
+        if refresh is None:
+            refresh = asyncio.ensure_future(self._refresh_service_health(client, service_name, health_url))
+            self._health_refresh[service_name] = refresh
+        
+        if age is not None and age < HEALTH_MAX_STALE:
+            return cached[1]
+        # Aucun résultat, ou résultat trop ancien : attendre la sonde (partagée, jamais annulée
+        # par un client qui se déconnecte)
+        return await asyncio.shield(refresh)
+    
+    async def _refresh_service_health(self, client: httpx.AsyncClient, service_name: str, health_url: str) -> Dict[str, Any]:
+        """Sonde un service et mémorise le résultat"""
+        try:
+            result = await self._probe_service_health(client, health_url)
+            self._health_cache[service_name] = (time.monotonic(), result)
+            return result
+        finally:
+            self._health_refresh.pop(service_name, None)
+    
+    async def _probe_service_health(self, client: httpx.AsyncClient, health_url: str) -> Dict[str, Any]:
+        """
+        Interroge l'endpoint de health check d'un service
+        
+        HEALTH_CHECK_TIMEOUT borne la durée totale de la sonde (le timeout httpx ne borne
+        que chaque étape) : un service lent ne retarde jamais /health/ au-delà.
+        """
         
         try:
-            response = await client.get(health_url)
+            async with asyncio.timeout(HEALTH_CHECK_TIMEOUT):
+                response = await client.get(health_url, timeout=HEALTH_CHECK_TIMEOUT)
             
             if response.status_code == 200:
                 return {
@@ -175,6 +414,12 @@ class ServiceRouter:
                     "error": f"HTTP {response.status_code}"
                 }
                 
+        except (TimeoutError, httpx.TimeoutException):
+            return {
+                "status": "timeout",
+                "url": health_url,
+                "error": f"Pas de réponse en {HEALTH_CHECK_TIMEOUT}s"
+            }
         except Exception as e:
             return {
                 "status": "unreachable",
@@ -185,33 +430,20 @@ class ServiceRouter:
 # Instance globale du router
 router = ServiceRouter()
 
-async def get_current_user(request: Request):
+def get_current_user(path: str, method: str, authorization: Optional[bytes]) -> CurrentUser:
     """
-    Dependency pour extraire et valider l'utilisateur à partir du JWT
+    Extrait et valide l'utilisateur à partir du JWT
     Compatible avec le frontend existant
-    """
-    logger.info(f"🔐 GET_CURRENT_USER: START - {request.method} {request.url.path}")
-    
-    # Vérifier si la route est publique
-    is_public = JWTMiddleware.is_public_route(request.url.path, request.method)
-    logger.info(f"🔐 GET_CURRENT_USER: Route publique check - {is_public}")
-    
-    if is_public:
-        logger.info(f"✅ GET_CURRENT_USER: Route publique accédée - {request.method} {request.url.path}")
-        return None
     
+    N'est appelée que pour les routes protégées : les routes publiques sont écartées
+    en amont par ProxyASGI, sans lecture du header Authorization.
+    """
     # Extraire le token
-    authorization = request.headers.get("authorization")
-    logger.info(f"🔐 GET_CURRENT_USER: Authorization header - {'Present' if authorization else 'Missing'}")
-    if authorization:
-        logger.info(f"🔐 GET_CURRENT_USER: Authorization header value - {authorization[:20]}...")
-    
     token = JWTMiddleware.extract_token(authorization)
-    logger.info(f"🔐 GET_CURRENT_USER: Token extracted - {'Present' if token else 'Missing'}")
     
     if not token:
         # Pour compatibilité frontend, retourner 401 avec format attendu
-        logger.warning(f"❌ GET_CURRENT_USER: Accès non authentifié à une route protégée - {request.method} {request.url.path}")
+        logger.warning("❌ GET_CURRENT_USER: Accès non authentifié à une route protégée - %s %s", method, path)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Token d'authentification requis",
@@ -220,221 +452,303 @@ async def get_current_user(request: Request):
     
     # Valider le token et retourner les informations utilisateur
     try:
-        logger.info(f"🔐 GET_CURRENT_USER: Validating token...")
-        user = JWTMiddleware.validate_token(token)
-        logger.info(f"✅ GET_CURRENT_USER: Token valid - user_id: {user.get('user_id')}, tenant_id: {user.get('tenant_id')}")
+        user = JWTMiddleware.validate_token_cached(token)
+        logger.debug("✅ GET_CURRENT_USER: Token valid - user_id: %s, tenant_id: %s", user.user_id, user.tenant_id)
         return user
     except Exception as e:
-        logger.error(f"❌ GET_CURRENT_USER: Token validation failed - {str(e)}")
+        logger.error("❌ GET_CURRENT_USER: Token validation failed - %s", e)
         raise
 
-@app.get("/")
-async def gateway_info():
-    """Informations sur l'API Gateway"""
-    
+def _static_json_headers(body: bytes) -> Dict[str, str]:
+    """Headers de cache HTTP d'un corps JSON figé : ETag (empreinte du contenu) et Cache-Control"""
     return {
-        "service": "api-gateway",
-        "version": "1.0.0", 
-        "status": "operational",
-        "documentation": "/docs" if DEBUG else "disabled",
-        "legacy_compatibility": "enabled",
-        "endpoints": {
-            "health": "/health/",
-            "auth": "/api/auth/*",
-            "tenants": "/api/tenants/*",
-            "tiers": "/api/tiers/*",
-            "legacy": "Mapping automatique des anciennes routes"
-        },
-        "services_backend": list(router.services.keys())
+        "ETag": f'"{hashlib.sha1(body).hexdigest()}"',
+        "Cache-Control": "public, max-age=3600"
     }
 
+def _static_json_response(request: Request, body: bytes, headers: Dict[str, str]) -> Response:
+    """Réponse JSON figée, ou 304 Not Modified si le client possède déjà cette version"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        if "*" in tags or headers["ETag"] in tags:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+# Informations du gateway : données figées après l'initialisation, sérialisées une fois
+_GATEWAY_INFO_JSON = orjson.dumps({
+    "service": "api-gateway",
+    "version": "1.0.0", 
+    "status": "operational",
+    "documentation": "/docs" if DEBUG else "disabled",
+    "legacy_compatibility": "enabled",
+    "endpoints": {
+        "health": "/health/",
+        "auth": "/api/auth/*",
+        "tenants": "/api/tenants/*",
+        "tiers": "/api/tiers/*",
+        "legacy": "Mapping automatique des anciennes routes"
+    },
+    "services_backend": list(router.services.keys())
+})
+_GATEWAY_INFO_HEADERS = _static_json_headers(_GATEWAY_INFO_JSON)
+
+@app.get("/")
+async def gateway_info(request: Request):
+    """Informations sur l'API Gateway"""
+    return _static_json_response(request, _GATEWAY_INFO_JSON, _GATEWAY_INFO_HEADERS)
+
 @app.get("/health/")
+@app.get("/healthz", include_in_schema=False)
+@app.get("/readyz", include_in_schema=False)
 async def health_check():
     """Health check de l'API Gateway et de tous les services"""
-    
-    health_data = await router.health_check_all()
+    status_code, health_data = await gateway_health()
+    return ORJSONResponse(content=health_data, status_code=status_code)
+
+async def gateway_health() -> tuple[int, Dict[str, Any]]:
+    """État de santé agrégé et status code associé (200, ou 503 si un service est dégradé)"""
+    health_data = await router.health_check_all(app.state.http_client)
     
     # Déterminer le status code
     if health_data["gateway"]["overall_status"] == "healthy":
-        return JSONResponse(content=health_data, status_code=200)
-    else:
-        return JSONResponse(content=health_data, status_code=503)
+        return status.HTTP_200_OK, health_data
+    return status.HTTP_503_SERVICE_UNAVAILABLE, health_data
+
+# Sondes de santé (sans header Origin) servies avant CORS et le routage FastAPI
+app.add_middleware(HealthCheckInterceptor, check=gateway_health)
 
 # Note: L'endpoint /tenants/current_tenant_info/ est géré par le routage standard via LEGACY_ROUTE_MAPPING
 
+# Taux de TVA servis directement par l'API Gateway (données constantes)
+VAT_RATES = [
+    {
+        'code': "0", 
+        'name': "0%", 
+        'rate': 0.0,
+        'rate_display': "0%",
+        'description': "Taux de TVA à 0%",
+        'is_default': False,
+        'is_active': True
+    },
+    {
+        'code': "5.5", 
+        'name': "5.5%", 
+        'rate': 5.5,
+        'rate_display': "5.5%",
+        'description': "Taux de TVA à 5.5%",
+        'is_default': False,
+        'is_active': True
+    },
+    {
+        'code': "10", 
+        'name': "10%", 
+        'rate': 10.0,
+        'rate_display': "10%",
+        'description': "Taux de TVA à 10%",
+        'is_default': False,
+        'is_active': True
+    },
+    {
+        'code': "20", 
+        'name': "20%", 
+        'rate': 20.0,
+        'rate_display': "20%",
+        'description': "Taux de TVA à 20%",
+        'is_default': True,
+        'is_active': True
+    }
+]
+
+# Corps JSON sérialisé une seule fois à l'import
+_VAT_RATES_JSON = orjson.dumps(VAT_RATES)
+_VAT_RATES_HEADERS = _static_json_headers(_VAT_RATES_JSON)
+
 # Endpoint direct pour les taux de TVA (sans authentification)
 @app.get("/api/quotes/vat-rates/", include_in_schema=True)
-async def vat_rates_endpoint():
+async def vat_rates_endpoint(request: Request):
     """
     Endpoint direct pour les taux de TVA sans authentification requise
     """
-    logger.info("Accès direct à l'endpoint des taux de TVA")
-    
-    # Définition des taux de TVA directement dans l'API Gateway
-    vat_rates = [
-        {
-            'code': "0", 
-            'name': "0%", 
-            'rate': 0.0,
-            'rate_display': "0%",
-            'description': "Taux de TVA à 0%",
-            'is_default': False,
-            'is_active': True
-        },
-        {
-            'code': "5.5", 
-            'name': "5.5%", 
-            'rate': 5.5,
-            'rate_display': "5.5%",
-            'description': "Taux de TVA à 5.5%",
-            'is_default': False,
-            'is_active': True
-        },
-        {
-            'code': "10", 
-            'name': "10%", 
-            'rate': 10.0,
-            'rate_display': "10%",
-            'description': "Taux de TVA à 10%",
-            'is_default': False,
-            'is_active': True
-        },
-        {
-            'code': "20", 
-            'name': "20%", 
-            'rate': 20.0,
-            'rate_display': "20%",
-            'description': "Taux de TVA à 20%",
-            'is_default': True,
-            'is_active': True
-        }
-    ]
-    
-    return vat_rates
+    logger.debug("Accès direct à l'endpoint des taux de TVA")
+    return _static_json_response(request, _VAT_RATES_JSON, _VAT_RATES_HEADERS)
 
-@app.api_route("/{path:path}", methods=["GET", "POST", "PUT", "DELETE", "PATCH", "OPTIONS"])
-async def proxy_request(
-    request: Request, 
-    path: str,
-    current_user: dict = Depends(get_current_user)
-):
+class ProxyASGI:
     """
     Proxy intelligent avec compatibilité frontend existant
+
+    Application ASGI pure montée en dernier sur l'application FastAPI : les endpoints
+    statiques restent gérés par FastAPI, toutes les autres routes sont proxifiées ici
+    sans résolution de dépendances ni construction d'objets Request/Response.
     """
-    logger.info(f"🚀 PROXY_REQUEST: START - Method: {request.method}, Path: /{path}")
-    logger.info(f"🚀 PROXY_REQUEST: Headers: {dict(request.headers)}")
-    logger.info(f"🚀 PROXY_REQUEST: Query params: {dict(request.query_params)}")
     
-    # Résoudre le service cible (avec mapping de compatibilité)
-    try:
-        logger.info(f"🔍 PROXY_REQUEST: Calling router.resolve_service('/{path}')")
-        service_url, target_path = router.resolve_service(f"/{path}")
+    METHODS = frozenset({"GET", "HEAD", "POST", "PUT", "DELETE", "PATCH", "OPTIONS"})
+    ALLOW = ", ".join(sorted(METHODS))
+    # Headers hop-by-hop (RFC 7230 §6.1) : propres à chaque connexion, jamais relayés
+    HOP_BY_HOP_HEADERS = frozenset({
+        b"connection", b"keep-alive", b"proxy-authenticate", b"proxy-authorization",
+        b"te", b"trailer", b"transfer-encoding", b"upgrade"
+    })
+    DROP_REQUEST_HEADERS = HOP_BY_HOP_HEADERS | {b"host"}
+    # Les headers d'identité fournis par le client sont remplacés par ceux du token
+    DROP_REQUEST_HEADERS_AUTHENTICATED = DROP_REQUEST_HEADERS | {b"x-user-id", b"x-tenant-id", b"x-user-email"}
+    DROP_RESPONSE_HEADERS = HOP_BY_HOP_HEADERS
+    
+    def __init__(self, router: ServiceRouter):
+        self.router = router
+        # Méthode liée résolue une fois (appelée à chaque requête)
+        self._classify = router.classify_path
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await WebSocketClose()(scope, receive, send)
+            return
+        
+        method = scope["method"]
+        path = scope["path"]
+        request_headers = scope["headers"]
+        if method not in self.METHODS:
+            raise HTTPException(
+                status_code=status.HTTP_405_METHOD_NOT_ALLOWED,
+                headers={"Allow": self.ALLOW}
+            )
         
-        # Log détaillé pour le débogage
-        logger.info(f"✅ PROXY_REQUEST: Route résolue - /{path} -> service: {service_url}, path: {target_path}")
+        # OPTIONS : réponse locale, jamais relayée aux backends. Les preflights CORS
+        # sont déjà traités par CORSMiddleware avant d'arriver ici.
+        if method == "OPTIONS":
+            await Response(status_code=status.HTTP_204_NO_CONTENT, headers={"Allow": self.ALLOW})(scope, receive, send)
+            return
         
-        # Construire l'URL complète
-        full_url = f"{service_url}{target_path}"
-        logger.info(f"✅ PROXY_REQUEST: URL complète construite - {full_url}")
+        # Une seule classification par requête : authentification et service cible
+        kind, resolved = self._classify(path, method)
         
-    except Exception as e:
-        logger.error(f"❌ PROXY_REQUEST: Erreur lors de la résolution de la route /{path}: {str(e)}")
-        logger.error(f"❌ PROXY_REQUEST: Exception type: {type(e).__name__}")
-        logger.error(f"❌ PROXY_REQUEST: Exception args: {e.args}")
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Route non trouvée: /{path}"
-        )
-    
-    # Préparer les headers
-    headers = dict(request.headers)
-    logger.info(f"📋 PROXY_REQUEST: Headers initiaux - {headers}")
-    
-    # Ajouter les informations utilisateur si authentifié
-    if current_user:
-        headers["X-User-ID"] = str(current_user["user_id"])
-        headers["X-Tenant-ID"] = str(current_user["tenant_id"])
-        headers["X-User-Email"] = current_user.get("email", "")
+        # Routes publiques : aucune étape d'authentification
+        if kind == "public":
+            current_user = None
+        else:
+            authorization = next((value for name, value in request_headers if name == b"authorization"), None)
+            current_user = get_current_user(path, method, authorization)
         
-        # LOG pour débugger
-        logger.info(f"🔐 PROXY_REQUEST: User authenticated - {current_user['email']}, Tenant: {current_user['tenant_id']}")
-    else:
-        logger.info(f"🔐 PROXY_REQUEST: No user authentication")
-    
-    # Nettoyer les headers problématiques
-    headers.pop("host", None)
-    headers.pop("content-length", None)
-    logger.info(f"📋 PROXY_REQUEST: Headers nettoyés - {headers}")
-    
-    # Lire le body de la requête
-    body = await request.body()
-    logger.info(f"📄 PROXY_REQUEST: Body length: {len(body)} bytes")
-    if body and len(body) < 1000:  # Log only small bodies
-        logger.info(f"📄 PROXY_REQUEST: Body content: {body.decode('utf-8', errors='ignore')}")
-    
-    # Effectuer la requête vers le service backend
-    logger.info(f"🌐 PROXY_REQUEST: Envoi requête vers {full_url}")
-    async with httpx.AsyncClient(timeout=30.0) as client:
+        if resolved is None:
+            logger.warning("❌ PROXY_REQUEST: Aucun service configuré pour la route %s", path)
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Route non trouvée: {path}"
+            )
+        service_url, full_url = resolved
+        
+        # URL complète précalculée ; query string relayée brute, sans re-parsing
+        query_string = scope["query_string"]
+        url = httpx.URL(full_url, query=query_string) if query_string else full_url
+        
+        # Préparer les headers directement au format ASGI (noms déjà en minuscules),
+        # en retirant les headers problématiques. Content-Length est conservé : le body
+        # est relayé tel quel, httpx choisit lui-même le framing du body sortant
+        drop = self.DROP_REQUEST_HEADERS_AUTHENTICATED if current_user else self.DROP_REQUEST_HEADERS
+        headers = [header for header in request_headers if header[0] not in drop]
+        
+        # Le body de la réponse est relayé brut : ne pas laisser httpx demander un encodage
+        # que le client n'accepte pas
+        if not any(name == b"accept-encoding" for name, _ in headers):
+            headers.append((b"accept-encoding", b"identity"))
+        
+        # Ajouter les informations utilisateur si authentifié
+        if current_user:
+            headers.extend(current_user.headers)
+        
+        # Lire le body de la requête : un seul message dans le cas courant,
+        # sinon relayé en streaming sans être bufferisé
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return
+        if message.get("more_body", False):
+            body = self._stream_body(message.get("body", b""), receive)
+        else:
+            body = message.get("body", b"")
+        
+        # Effectuer la requête vers le service backend
+        client = scope["app"].state.http_client
         try:
-            logger.info(f"🌐 PROXY_REQUEST: httpx.request - method: {request.method}, url: {full_url}")
-            logger.info(f"🌐 PROXY_REQUEST: httpx.request - headers: {headers}")
-            logger.info(f"🌐 PROXY_REQUEST: httpx.request - params: {dict(request.query_params)}")
-            
-            response = await client.request(
-                method=request.method,
-                url=full_url,
+            upstream_request = client.build_request(
+                method=method,
+                url=url,
                 content=body,
-                headers=headers,
-                params=dict(request.query_params)
+                headers=headers
             )
+            response = await client.send(upstream_request, stream=True)
             
             # Logger la requête avec mapping
-            logger.info(f"✅ PROXY_REQUEST: Response reçue - {request.method} /{path} → {full_url} ({response.status_code})")
-            logger.info(f"✅ PROXY_REQUEST: Response headers - {dict(response.headers)}")
-            
-            # Log response content if small
-            if response.content and len(response.content) < 1000:
-                logger.info(f"✅ PROXY_REQUEST: Response content - {response.content.decode('utf-8', errors='ignore')}")
-            
-            # Retourner la réponse directement sans re-sérialisation
-            logger.info(f"✅ PROXY_REQUEST: Returning response with status {response.status_code}")
-            
-            # Préparer les headers de réponse
-            response_headers = {}
-            for key, value in response.headers.items():
-                if key.lower() not in ['content-encoding', 'transfer-encoding', 'connection']:
-                    response_headers[key] = value
-            
-            return Response(
-                content=response.content,
-                status_code=response.status_code,
-                headers=response_headers,
-                media_type=response.headers.get('content-type', 'application/json')
-            )
+            logger.debug("✅ PROXY_REQUEST: %s %s → %s (%s)", method, path, full_url, response.status_code)
             
         except httpx.TimeoutException as e:
-            logger.error(f"❌ PROXY_REQUEST: Timeout lors de la requête vers {service_url} - {str(e)}")
+            logger.error("❌ PROXY_REQUEST: Timeout lors de la requête vers %s - %s", service_url, e)
             raise HTTPException(
                 status_code=status.HTTP_504_GATEWAY_TIMEOUT,
                 detail="Le service backend a mis trop de temps à répondre"
             )
         except httpx.RequestError as e:
-            logger.error(f"❌ PROXY_REQUEST: Erreur de communication avec {service_url} - {str(e)}")
-            logger.error(f"❌ PROXY_REQUEST: RequestError details - {e.__class__.__name__}: {e}")
+            logger.error("❌ PROXY_REQUEST: Erreur de communication avec %s - %s: %s", service_url, e.__class__.__name__, e)
             raise HTTPException(
                 status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
                 detail=f"Service temporairement indisponible: {str(e)}"
             )
-        except Exception as e:
-            logger.error(f"❌ PROXY_REQUEST: Erreur inattendue lors du proxy - {str(e)}")
-            logger.error(f"❌ PROXY_REQUEST: Exception type: {type(e).__name__}")
-            logger.error(f"❌ PROXY_REQUEST: Exception args: {e.args}")
-            import traceback
-            logger.error(f"❌ PROXY_REQUEST: Traceback: {traceback.format_exc()}")
+        except Exception:
+            logger.exception("❌ PROXY_REQUEST: Erreur inattendue lors du proxy %s %s", method, path)
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Erreur interne du gateway"
             )
+        
+        # Retourner la réponse directement sans re-sérialisation ni bufferisation
+        try:
+            # Préparer les headers de réponse sans passer par un dict (body brut :
+            # Content-Encoding/Length restent valides). httpx conserve la casse du backend
+            drop = self.DROP_RESPONSE_HEADERS
+            response_headers = []
+            append = response_headers.append
+            for name, value in response.headers.raw:
+                name = name.lower()
+                if name not in drop:
+                    append((name, value))
+            if "content-type" not in response.headers:
+                response_headers.append((b"content-type", b"application/json"))
+            
+            await send({
+                "type": "http.response.start",
+                "status": response.status_code,
+                "headers": response_headers
+            })
+            async for chunk in response.aiter_raw():
+                await send({
+                    "type": "http.response.body",
+                    "body": chunk,
+                    "more_body": True
+                })
+            await send({
+                "type": "http.response.body",
+                "body": b"",
+                "more_body": False
+            })
+        except httpx.HTTPError as e:
+            logger.error("❌ PROXY_REQUEST: Flux interrompu depuis %s - %s", service_url, e)
+            raise
+        finally:
+            await response.aclose()
+    
+    @staticmethod
+    async def _stream_body(first_chunk: bytes, receive: Receive) -> AsyncIterator[bytes]:
+        """Relaie le body de la requête entrante chunk par chunk"""
+        yield first_chunk
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            yield message.get("body", b"")
+            if not message.get("more_body", False):
+                return
+
+# Proxy monté en dernier : les routes statiques ci-dessus sont prioritaires
+app.mount("/", ProxyASGI(router))
 
 if __name__ == "__main__":
     uvicorn.run(
@@ -442,5 +756,10 @@ if __name__ == "__main__":
         host=GATEWAY_HOST,
         port=GATEWAY_PORT,
         reload=DEBUG,
+        workers=1 if DEBUG else GATEWAY_WORKERS,
+        loop="uvloop",
+        http="httptools",
+        # Une ligne de log par requête proxifiée : réservé au développement
+        access_log=DEBUG,
         log_level="info"
     ) 
@@ -1,132 +1,198 @@
 """
 Middleware pour l'authentification JWT
 """
+import hashlib
 import jwt
 import logging
-from typing import Optional, Dict, Any
+import orjson
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Optional, Any, Iterable, Tuple
 from fastapi import HTTPException, status
-from config import JWT_SECRET_KEY, JWT_ALGORITHM, PUBLIC_ROUTES
+from config import JWT_SECRET_KEY, JWT_ALGORITHM, PUBLIC_ROUTES, JWT_CACHE_TTL, JWT_CACHE_MAXSIZE
 
 logger = logging.getLogger(__name__)
 
+
+@dataclass(frozen=True, slots=True)
+class CurrentUser:
+    """Utilisateur authentifié, extrait d'un token JWT validé"""
+    user_id: Any
+    tenant_id: Any
+    email: Optional[str] = None
+    exp: Optional[float] = None
+    iat: Optional[float] = None
+    # Headers d'identité transmis aux backends, encodés une fois par token
+    headers: Tuple[Tuple[bytes, bytes], ...] = field(init=False, repr=False, compare=False)
+    
+    def __post_init__(self):
+        headers = (
+            (b"x-user-id", str(self.user_id).encode()),
+            (b"x-tenant-id", str(self.tenant_id).encode()),
+        )
+        # Email absent du token : pas de header vide (un X-User-Email client est retiré de toute façon)
+        if self.email:
+            headers += ((b"x-user-email", self.email.encode()),)
+        object.__setattr__(self, "headers", headers)
+
+# Cache des tokens déjà validés : empreinte SHA-256 du token -> (expiration, utilisateur)
+_token_cache: "OrderedDict[bytes, Tuple[float, CurrentUser]]" = OrderedDict()
+
+
+def _prefix_tuple(prefixes: Iterable[str]) -> Tuple[str, ...]:
+    """Dédoublonne une liste de préfixes pour str.startswith (une seule boucle, en C)"""
+    return tuple(sorted(set(prefixes), key=len, reverse=True))
+
+# Clé de vérification préparée une seule fois à l'import (une clé publique PEM
+# pour RS*/ES* n'est ainsi parsée qu'au démarrage, pas à chaque requête)
+_JWT_ALGORITHMS = [JWT_ALGORITHM]
+_JWT_KEY = jwt.get_algorithm_by_name(JWT_ALGORITHM).prepare_key(JWT_SECRET_KEY)
+
+
+class _OrjsonPyJWT(jwt.PyJWT):
+    """Décodeur PyJWT dont le payload est parsé par orjson plutôt que par json"""
+    
+    def _decode_payload(self, decoded: dict[str, Any]) -> Any:
+        try:
+            payload = orjson.loads(decoded["payload"])
+        except orjson.JSONDecodeError as e:
+            raise jwt.DecodeError(f"Invalid payload string: {e}")
+        if not isinstance(payload, dict):
+            raise jwt.DecodeError("Invalid payload string: must be a json object")
+        return payload
+
+_jwt_decoder = _OrjsonPyJWT()
+
+# Routes publiques préparées à l'import : un seul appel str.startswith par requête
+_PUBLIC_EXACT = frozenset({"/api/quotes/vat-rates/", "/vat-rates/"})
+_PUBLIC_PREFIXES = _prefix_tuple(PUBLIC_ROUTES)
+# GET (et HEAD) sur tenants (lecture publique pour validation)
+_PUBLIC_PREFIXES_GET = _prefix_tuple([*PUBLIC_ROUTES, "/api/tenants/"])
+
 class JWTMiddleware:
     """Middleware pour gérer l'authentification JWT"""
     
     @staticmethod
     def is_public_route(path: str, method: str) -> bool:
         """Vérifie si une route est publique"""
-        logger.info(f"🔒 IS_PUBLIC_ROUTE: Checking path='{path}', method='{method}'")
-        
-        # Routes toujours publiques
-        for public_route in PUBLIC_ROUTES:
-            if path.startswith(public_route):
-                logger.info(f"✅ IS_PUBLIC_ROUTE: Match found in PUBLIC_ROUTES - '{public_route}'")
-                return True
-        
-        # GET sur tenants (lecture publique pour validation)
-        if path.startswith("/api/tenants/") and method == "GET":
-            logger.info(f"✅ IS_PUBLIC_ROUTE: GET tenant route - public")
-            return True
-            
         # Routes VAT (explicitement publiques)
-        if path == "/api/quotes/vat-rates/" or path == "/vat-rates/":
-            logger.info(f"✅ IS_PUBLIC_ROUTE: VAT rates route - public")
+        if path in _PUBLIC_EXACT:
+            return True
+        
+        # Routes toujours publiques (+ lecture des tenants en GET)
+        if path.startswith(_PUBLIC_PREFIXES_GET if method in ("GET", "HEAD") else _PUBLIC_PREFIXES):
+            logger.debug("✅ IS_PUBLIC_ROUTE: %s %s - match in PUBLIC_ROUTES", method, path)
             return True
         
-        logger.info(f"❌ IS_PUBLIC_ROUTE: Route not public - authentication required")
-        logger.info(f"❌ IS_PUBLIC_ROUTE: Available PUBLIC_ROUTES: {PUBLIC_ROUTES}")
+        logger.debug("❌ IS_PUBLIC_ROUTE: %s %s - authentication required", method, path)
         return False
     
     @staticmethod
-    def extract_token(authorization: Optional[str]) -> Optional[str]:
-        """Extrait le token JWT du header Authorization"""
-        logger.info(f"🔓 EXTRACT_TOKEN: Authorization header - {'Present' if authorization else 'None'}")
-        
+    def extract_token(authorization: Optional[bytes]) -> Optional[bytes]:
+        """Extrait le token JWT du header Authorization brut (octets ASGI, sans décodage)"""
         if not authorization:
-            logger.info(f"❌ EXTRACT_TOKEN: No authorization header")
             return None
-            
-        try:
-            auth_parts = authorization.split()
-            logger.info(f"🔓 EXTRACT_TOKEN: Split authorization into {len(auth_parts)} parts")
-            
-            if len(auth_parts) != 2:
-                logger.error(f"❌ EXTRACT_TOKEN: Invalid authorization format - expected 2 parts, got {len(auth_parts)}")
-                return None
-                
-            auth_type, token = auth_parts
-            logger.info(f"🔓 EXTRACT_TOKEN: Auth type='{auth_type}', token length={len(token)}")
-            
-            if auth_type.lower() != "bearer":
-                logger.error(f"❌ EXTRACT_TOKEN: Invalid auth type - expected 'bearer', got '{auth_type.lower()}'")
-                return None
-            
-            logger.info(f"✅ EXTRACT_TOKEN: Token extracted successfully")
-            return token
-        except ValueError as e:
-            logger.error(f"❌ EXTRACT_TOKEN: ValueError splitting authorization - {str(e)}")
+        
+        auth_type, _, token = authorization.strip().partition(b" ")
+        token = token.lstrip()
+        
+        if not token or b" " in token:
+            logger.warning("❌ EXTRACT_TOKEN: Invalid authorization format - expected 'Bearer <token>'")
             return None
+        
+        if auth_type.lower() != b"bearer":
+            logger.warning("❌ EXTRACT_TOKEN: Invalid auth type - expected 'bearer', got '%s'", auth_type.lower().decode("latin-1"))
+            return None
+        
+        return token
     
     @staticmethod
-    def validate_token(token: str) -> Dict[str, Any]:
+    def validate_token(token: bytes) -> CurrentUser:
         """
         Valide un token JWT et retourne les informations utilisateur
         
         Raises:
             HTTPException: Si le token est invalide
         """
-        logger.info(f"🔐 VALIDATE_TOKEN: Starting token validation - token length: {len(token)}")
-        
         try:
-            logger.info(f"🔐 VALIDATE_TOKEN: Decoding JWT with algorithm {JWT_ALGORITHM}")
-            payload = jwt.decode(
+            payload = _jwt_decoder.decode(
                 token,
-                JWT_SECRET_KEY,
-                algorithms=[JWT_ALGORITHM]
+                _JWT_KEY,
+                algorithms=_JWT_ALGORITHMS
             )
             
-            logger.info(f"🔐 VALIDATE_TOKEN: JWT decoded successfully - payload keys: {list(payload.keys())}")
-            
             # Vérifier les champs obligatoires
             user_id = payload.get("user_id")
             tenant_id = payload.get("tenant_id")
             
-            logger.info(f"🔐 VALIDATE_TOKEN: user_id={'Present' if user_id else 'Missing'}, tenant_id={'Present' if tenant_id else 'Missing'}")
-            
             if not user_id or not tenant_id:
-                logger.error(f"❌ VALIDATE_TOKEN: Missing required fields - user_id: {user_id}, tenant_id: {tenant_id}")
+                logger.warning("❌ VALIDATE_TOKEN: Missing required fields - user_id: %s, tenant_id: %s", user_id, tenant_id)
                 raise HTTPException(
                     status_code=status.HTTP_401_UNAUTHORIZED,
                     detail="Token JWT valide mais informations utilisateur manquantes"
                 )
             
-            user_data = {
-                "user_id": user_id,
-                "tenant_id": tenant_id,
-                "email": payload.get("email"),
-                "exp": payload.get("exp"),
-                "iat": payload.get("iat")
-            }
+            user_data = CurrentUser(
+                user_id=user_id,
+                tenant_id=tenant_id,
+                email=payload.get("email"),
+                exp=payload.get("exp"),
+                iat=payload.get("iat")
+            )
             
-            logger.info(f"✅ VALIDATE_TOKEN: Token validation successful - user_id: {user_id}, tenant_id: {tenant_id}")
+            logger.debug("✅ VALIDATE_TOKEN: Token validation successful - user_id: %s, tenant_id: %s", user_id, tenant_id)
             return user_data
             
         except jwt.ExpiredSignatureError as e:
-            logger.error(f"❌ VALIDATE_TOKEN: Token expired - {str(e)}")
+            logger.warning("❌ VALIDATE_TOKEN: Token expired - %s", e)
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Token JWT expiré"
             )
         except jwt.InvalidTokenError as e:
-            logger.error(f"❌ VALIDATE_TOKEN: Invalid token - {str(e)}")
+            logger.warning("❌ VALIDATE_TOKEN: Invalid token - %s", e)
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Token JWT invalide"
             )
         except Exception as e:
-            logger.error(f"❌ VALIDATE_TOKEN: Unexpected error - {str(e)}")
-            logger.error(f"❌ VALIDATE_TOKEN: Exception type: {type(e).__name__}")
+            logger.error("❌ VALIDATE_TOKEN: Unexpected error - %s (%s)", e, type(e).__name__)
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Erreur de validation du token"
-            ) 
\ No newline at end of file
+            )
+    
+    @staticmethod
+    def validate_token_cached(token: bytes) -> CurrentUser:
+        """
+        Valide un token JWT en réutilisant le résultat d'une validation récente
+        
+        Le cache est indexé par l'empreinte SHA-256 du token (le token brut n'est jamais
+        conservé) et une entrée n'est jamais servie au-delà de l'expiration du token.
+        Les tokens invalides ne sont pas mis en cache.
+        
+        Raises:
+            HTTPException: Si le token est invalide
+        """
+        key = hashlib.sha256(token).digest()
+        now = time.time()
+        
+        cached = _token_cache.get(key)
+        if cached is not None:
+            expires_at, user_data = cached
+            if expires_at > now:
+                _token_cache.move_to_end(key)
+                return user_data
+            del _token_cache[key]
+        
+        user_data = JWTMiddleware.validate_token(token)
+        
+        expires_at = now + JWT_CACHE_TTL
+        if user_data.exp:
+            expires_at = min(expires_at, user_data.exp)
+        _token_cache[key] = (expires_at, user_data)
+        if len(_token_cache) > JWT_CACHE_MAXSIZE:
+            _token_cache.popitem(last=False)
+        
+        return user_data
@@ -5,12 +5,34 @@ Script de test pour vérifier l'intégration du Document Service avec l'API Gate
 
 import asyncio
 import httpx
+import io
 import json
-from typing import Dict, List
+import orjson
+import sys
+from typing import Dict, List, Optional, Set, Tuple
+
+from integration_helpers import VERBOSE, make_client, retry
 
 # Configuration des tests
 GATEWAY_URL = "http://localhost:8000"
 DOCUMENT_SERVICE_URL = "http://localhost:8004"
+# Durée minimale (secondes) de mise en cache des preflights CORS attendue du gateway
+CORS_MIN_MAX_AGE = 600
+# Routes legacy et modernes dont le routage vers le Document Service est vérifié
+LEGACY_ROUTES: Tuple[str, ...] = (
+    "/api/devis/",
+    "/api/factures/",
+    "/api/quotes/",
+    "/api/invoices/"
+)
+# Headers CORS rapportés dans les détails du test
+CORS_HEADER_NAMES = (
+    "access-control-allow-origin",
+    "access-control-allow-methods",
+    "access-control-allow-headers",
+    "access-control-allow-credentials",
+    "access-control-max-age"
+)
 
 class DocumentServiceIntegrationTester:
     """Testeur d'intégration pour le Document Service via l'API Gateway."""
@@ -19,34 +41,35 @@ class DocumentServiceIntegrationTester:
         self.gateway_url = GATEWAY_URL
         self.document_service_url = DOCUMENT_SERVICE_URL
         self.results = []
+        # Client HTTP partagé par tous les tests, ouvert et fermé par `async with`
+        self.client: Optional[httpx.AsyncClient] = None
+        # Routes qui refusent HEAD (405) : sondées directement en GET par la suite
+        self._head_unsupported: Set[str] = set()
     
     async def test_gateway_health(self) -> Dict:
         """Test du health check de l'API Gateway."""
         
-        print("🔍 Test du health check de l'API Gateway...")
-        
         try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.get(f"{self.gateway_url}/health/")
+            response = await retry(lambda: self.client.get(f"{self.gateway_url}/health/"))
+            
+            if response.status_code == 200:
+                health_data = orjson.loads(response.content)
+                document_service_status = health_data.get("services", {}).get("documents", {})
                 
-                if response.status_code == 200:
-                    health_data = response.json()
-                    document_service_status = health_data.get("services", {}).get("documents", {})
-                    
-                    return {
-                        "test": "Gateway Health Check",
-                        "status": "✅ PASS" if document_service_status.get("status") == "healthy" else "❌ FAIL",
-                        "details": {
-                            "gateway_status": health_data.get("gateway", {}).get("overall_status"),
-                            "document_service": document_service_status
-                        }
-                    }
-                else:
-                    return {
-                        "test": "Gateway Health Check",
-                        "status": "❌ FAIL",
-                        "details": f"HTTP {response.status_code}"
+                return {
+                    "test": "Gateway Health Check",
+                    "status": "✅ PASS" if document_service_status.get("status") == "healthy" else "❌ FAIL",
+                    "details": {
+                        "gateway_status": health_data.get("gateway", {}).get("overall_status"),
+                        "document_service": document_service_status
                     }
+                }
+            else:
+                return {
+                    "test": "Gateway Health Check",
+                    "status": "❌ FAIL",
+                    "details": f"HTTP {response.status_code}"
+                }
                     
         except Exception as e:
             return {
@@ -58,78 +81,64 @@ class DocumentServiceIntegrationTester:
     async def test_legacy_route_mapping(self) -> List[Dict]:
         """Test du mapping des routes legacy."""
         
-        print("🔍 Test du mapping des routes legacy...")
-        
-        legacy_routes = [
-            "/api/devis/",
-            "/api/factures/",
-            "/api/quotes/",
-            "/api/invoices/"
-        ]
-        
-        results = []
+        # Routes sondées en parallèle sur le client partagé ; chaque sonde capture ses erreurs
+        return list(await asyncio.gather(*(self._probe_route(route) for route in LEGACY_ROUTES)))
+    
+    async def _probe_route(self, route: str) -> Dict:
+        """Vérifie qu'une route est bien routée par le gateway (pas de 404)."""
         
         try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                
-                for route in legacy_routes:
-                    try:
-                        # Test avec un simple GET pour vérifier le routage
-                        response = await client.get(
-                            f"{self.gateway_url}{route}",
-                            headers={"X-Tenant-ID": "test"}
-                        )
-                        
-                        # Nous nous attendons soit à un 200, soit à un 401 (pas d'auth),
-                        # mais pas à un 404 (service non trouvé)
-                        is_routed_correctly = response.status_code != 404
-                        
-                        results.append({
-                            "test": f"Route Mapping: {route}",
-                            "status": "✅ PASS" if is_routed_correctly else "❌ FAIL",
-                            "details": {
-                                "status_code": response.status_code,
-                                "routed": is_routed_correctly
-                            }
-                        })
-                        
-                    except Exception as e:
-                        results.append({
-                            "test": f"Route Mapping: {route}",
-                            "status": "❌ FAIL",
-                            "details": f"Erreur: {str(e)}"
-                        })
-                        
+            # HEAD pour vérifier le routage : seul le status compte, aucun corps transféré.
+            # Repli sur GET (corps jamais téléchargé) si la route refuse HEAD
+            url = f"{self.gateway_url}{route}"
+            status_code = None
+            if route not in self._head_unsupported:
+                response = await retry(lambda: self.client.head(url, headers={"X-Tenant-ID": "test"}, follow_redirects=False))
+                status_code = response.status_code
+                if status_code == 405:
+                    self._head_unsupported.add(route)
+                    status_code = None
+            if status_code is None:
+                status_code = await retry(lambda: self._get_status(url, headers={"X-Tenant-ID": "test"}))
+            
+            # Nous nous attendons soit à un 200, soit à un 401 (pas d'auth),
+            # mais pas à un 404 (service non trouvé)
+            is_routed_correctly = status_code != 404
+            
+            return {
+                "test": f"Route Mapping: {route}",
+                "status": "✅ PASS" if is_routed_correctly else "❌ FAIL",
+                "details": {
+                    "status_code": status_code,
+                    "routed": is_routed_correctly
+                }
+            }
+            
         except Exception as e:
-            results.append({
-                "test": "Route Mapping (Global)",
+            return {
+                "test": f"Route Mapping: {route}",
                 "status": "❌ FAIL",
                 "details": f"Erreur: {str(e)}"
-            })
-        
-        return results
+            }
     
     async def test_document_service_direct(self) -> Dict:
         """Test direct du Document Service (bypass Gateway)."""
         
-        print("🔍 Test direct du Document Service...")
-        
         try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.get(f"{self.document_service_url}/health/")
-                
-                if response.status_code == 200:
-                    return {
-                        "test": "Document Service Direct",
-                        "status": "✅ PASS",
-                        "details": "Service accessible directement"
-                    }
-                else:
-                    return {
-                        "test": "Document Service Direct",
-                        "status": "❌ FAIL",
-                        "details": f"HTTP {response.status_code}"
-                    }
+            response = await retry(lambda: self.client.get(f"{self.document_service_url}/health/"))
+            
+            if response.status_code == 200:
+                return {
+                    "test": "Document Service Direct",
+                    "status": "✅ PASS",
+                    "details": "Service accessible directement"
+                }
+            else:
+                return {
+                    "test": "Document Service Direct",
+                    "status": "❌ FAIL",
+                    "details": f"HTTP {response.status_code}"
+                }
                     
         except Exception as e:
             return {
@@ -138,87 +147,154 @@ class DocumentServiceIntegrationTester:
                 "details": f"Service non accessible: {str(e)}"
             }
     
-    async def test_cors_headers(self) -> Dict:
-        """Test des headers CORS pour le frontend."""
-        
-        print("🔍 Test des headers CORS...")
+    async def test_cors_headers(self) -> List[Dict]:
+        """Test des headers CORS pour le frontend et de la mise en cache des preflights."""
         
         try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                # Simuler une requête OPTIONS pour CORS preflight
-                response = await client.options(
-                    f"{self.gateway_url}/api/quotes/",
-                    headers={
-                        "Origin": "http://localhost:3000",
-                        "Access-Control-Request-Method": "GET",
-                        "Access-Control-Request-Headers": "X-Tenant-ID"
-                    }
-                )
-                
-                has_cors_headers = "access-control-allow-origin" in response.headers
-                
-                return {
+            # Simuler une requête OPTIONS pour CORS preflight
+            response = await retry(lambda: self.client.options(
+                f"{self.gateway_url}/api/quotes/",
+                headers={
+                    "Origin": "http://localhost:3000",
+                    "Access-Control-Request-Method": "GET",
+                    "Access-Control-Request-Headers": "X-Tenant-ID"
+                }
+            ))
+            
+            has_cors_headers = "access-control-allow-origin" in response.headers
+            
+            # Sans Access-Control-Max-Age suffisant, le navigateur refait un preflight
+            # avant presque chaque requête cross-origin (requêtes doublées)
+            try:
+                max_age = int(response.headers.get("access-control-max-age", "0"))
+            except ValueError:
+                max_age = 0
+            has_max_age = max_age >= CORS_MIN_MAX_AGE
+            
+            return [
+                {
                     "test": "CORS Headers",
                     "status": "✅ PASS" if has_cors_headers else "❌ FAIL",
                     "details": {
                         "has_cors": has_cors_headers,
-                        "cors_headers": {k: v for k, v in response.headers.items() if k.startswith("access-control")}
+                        "cors_headers": {k: response.headers[k] for k in CORS_HEADER_NAMES if k in response.headers}
+                    }
+                },
+                {
+                    "test": "CORS preflight caching",
+                    "status": "✅ PASS" if has_max_age else "❌ FAIL",
+                    "details": {
+                        "has_max_age": has_max_age,
+                        "max_age_seconds": max_age,
+                        "minimum_seconds": CORS_MIN_MAX_AGE
                     }
                 }
+            ]
                 
         except Exception as e:
-            return {
+            return [{
                 "test": "CORS Headers",
                 "status": "❌ FAIL",
                 "details": f"Erreur: {str(e)}"
-            }
+            }]
+    
+    async def _get_status(self, url: str, headers: Dict[str, str]) -> int:
+        """GET dont seul le status est lu : le corps n'est jamais téléchargé"""
+        async with self.client.stream("GET", url, headers=headers) as response:
+            return response.status_code
+    
+    async def _warm_up(self):
+        """
+        Ouvre une première connexion vers chaque hôte avant les tests parallèles : les requêtes
+        suivantes réutilisent une connexion établie au lieu de toutes la négocier en même temps.
+        """
+        # Le status importe peu et un service arrêté est signalé par les tests eux-mêmes
+        await asyncio.gather(
+            self.client.head(f"{self.gateway_url}/health/"),
+            self.client.head(f"{self.document_service_url}/health/"),
+            return_exceptions=True
+        )
+    
+    async def __aenter__(self) -> "DocumentServiceIntegrationTester":
+        """Ouvre le client HTTP partagé par tous les tests (pool de connexions)."""
+        self.client = make_client(max_keepalive_connections=20, max_connections=100)
+        return self
+    
+    async def __aexit__(self, *exc_info) -> None:
+        """Ferme le client et ses connexions, y compris si un test a levé une exception."""
+        client, self.client = self.client, None
+        await client.aclose()
     
     async def run_all_tests(self):
-        """Exécute tous les tests."""
+        """Exécute tous les tests (à appeler dans un bloc `async with` du testeur)."""
         
         print("🚀 Tests d'intégration Document Service - API Gateway")
         print("=" * 60)
         
-        # Exécuter tous les tests
+        # Exécuter tous les tests avec le client HTTP partagé (ouvert par __aenter__)
         results = []
         
-        results.append(await self.test_gateway_health())
-        results.append(await self.test_document_service_direct())
-        results.extend(await self.test_legacy_route_mapping())
-        results.append(await self.test_cors_headers())
+        await self._warm_up()
         
-        # Afficher les résultats
-        print("\n📋 Résultats des tests :")
-        print("-" * 40)
+        # Tests indépendants : exécutés en parallèle, résultats dans l'ordre d'origine
+        tests = {
+            "Gateway Health Check": self.test_gateway_health(),
+            "Document Service Direct": self.test_document_service_direct(),
+            "Route Mapping (Global)": self.test_legacy_route_mapping(),
+            "CORS Headers": self.test_cors_headers(),
+        }
+        if VERBOSE:
+            print(f"🔍 Tests lancés en parallèle : {', '.join(tests)}")
+        outcomes = await asyncio.gather(*tests.values(), return_exceptions=True)
+        
+        for name, outcome in zip(tests, outcomes):
+            if isinstance(outcome, Exception):
+                results.append({
+                    "test": name,
+                    "status": "❌ FAIL",
+                    "details": f"Erreur: {str(outcome)}"
+                })
+            elif isinstance(outcome, list):
+                results.extend(outcome)
+            else:
+                results.append(outcome)
+        
+        # Rapport construit en mémoire puis écrit en une fois, une fois tous les tests terminés
+        report = io.StringIO()
+        report.write("\n📋 Résultats des tests :\n")
+        report.write("-" * 40 + "\n")
         
         passed = 0
         failed = 0
         
         for result in results:
-            print(f"{result['status']} {result['test']}")
-            if result.get('details'):
-                print(f"   Détails: {result['details']}")
+            is_passed = "✅ PASS" in result['status']
+            if VERBOSE or not is_passed:
+                report.write(f"{result['status']} {result['test']}\n")
+                if result.get('details'):
+                    report.write(f"   Détails: {result['details']}\n")
             
-            if "✅ PASS" in result['status']:
+            if is_passed:
                 passed += 1
             else:
                 failed += 1
         
-        print("\n" + "=" * 60)
-        print(f"📊 Résumé : {passed} tests réussis, {failed} tests échoués")
+        report.write("\n" + "=" * 60 + "\n")
+        report.write(f"📊 Résumé : {passed} tests réussis, {failed} tests échoués\n")
         
         if failed == 0:
-            print("🎉 Tous les tests sont passés ! L'intégration est fonctionnelle.")
-            return True
+            report.write("🎉 Tous les tests sont passés ! L'intégration est fonctionnelle.\n")
         else:
-            print("⚠️ Certains tests ont échoué. Vérifiez la configuration.")
-            return False
+            report.write("⚠️ Certains tests ont échoué. Vérifiez la configuration.\n")
+        
+        sys.stdout.write(report.getvalue())
+        return failed == 0
 
 async def main():
     """Point d'entrée principal."""
     
-    tester = DocumentServiceIntegrationTester()
-    success = await tester.run_all_tests()
+    async with DocumentServiceIntegrationTester() as tester:
+        success = await tester.run_all_tests()
     
     if not success:
         print("\n🔧 Actions recommandées :")
@@ -230,5 +306,4 @@ async def main():
     return 0 if success else 1
 
 if __name__ == "__main__":
-    import sys
     sys.exit(asyncio.run(main())) 
\ No newline at end of file
@@ -3,10 +3,14 @@
 Script de test pour valider l'intégration du service library dans l'API Gateway
 Phase 1 - Test du routage et health check
 """
-import requests
+import asyncio
+import httpx
 import json
+import orjson
 import time
-from typing import Dict, Any
+from typing import Any, Dict, Optional
+
+from integration_helpers import VERBOSE, make_client, retry
 
 # Configuration
 GATEWAY_URL = "http://localhost:8000"
@@ -21,15 +25,21 @@ class Colors:
     BOLD = '\033[1m'
 
 def print_success(message: str):
+    if not VERBOSE:
+        return
     print(f"{Colors.GREEN}✅ {message}{Colors.END}")
 
 def print_error(message: str):
     print(f"{Colors.RED}❌ {message}{Colors.END}")
 
 def print_warning(message: str):
+    if not VERBOSE:
+        return
     print(f"{Colors.YELLOW}⚠️  {message}{Colors.END}")
 
 def print_info(message: str):
+    if not VERBOSE:
+        return
     print(f"{Colors.BLUE}ℹ️  {message}{Colors.END}")
 
 def print_header(message: str):
@@ -37,35 +47,52 @@ def print_header(message: str):
     print(f"  {message}")
     print(f"{'='*60}{Colors.END}\n")
 
-def test_service_health(url: str, service_name: str) -> bool:
+async def test_service_health(client: httpx.AsyncClient, url: str, service_name: str) -> bool:
     """Teste le health check d'un service"""
     try:
-        response = requests.get(f"{url}/health/", timeout=5)
+        response = await retry(lambda: client.get(f"{url}/health/", timeout=5))
         if response.status_code == 200:
-            data = response.json()
+            data = orjson.loads(response.content)
             print_success(f"{service_name} is healthy: {data.get('status', 'N/A')}")
             return True
         else:
             print_error(f"{service_name} health check failed: HTTP {response.status_code}")
             return False
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         print_error(f"{service_name} is unreachable: {str(e)}")
         return False
 
-def test_gateway_routing(route: str, expected_service: str) -> bool:
+async def read_body_head(response: httpx.Response, limit: int = 2048) -> Optional[bytes]:
+    """Lit le corps d'une réponse en streaming ; None s'il dépasse `limit` octets (lecture abandonnée)"""
+    body = b""
+    async for chunk in response.aiter_bytes():
+        body += chunk
+        if len(body) > limit:
+            return None
+    return body
+
+async def test_gateway_routing(client: httpx.AsyncClient, route: str, expected_service: str) -> bool:
     """Teste le routage d'une route via l'API Gateway"""
     try:
         full_url = f"{GATEWAY_URL}{route}"
         print_info(f"Testing route: {route}")
         
-        response = requests.get(full_url, timeout=10)
+        async def fetch() -> tuple[int, Optional[bytes]]:
+            async with client.stream("GET", full_url, timeout=10) as response:
+                # Seul le début du corps est lu : assez pour le champ 'service', jamais une liste entière
+                return response.status_code, await read_body_head(response) if response.status_code == 200 else None
         
-        if response.status_code == 200:
+        status_code, body = await retry(fetch)
+        
+        if status_code == 200:
             # Vérifier si c'est bien du service library (si possible)
+            if body is None:
+                print_success(f"Route {route} → {expected_service} service (HTTP 200, data received)")
+                return True
             try:
-                data = response.json()
+                data = orjson.loads(body)
                 if isinstance(data, dict) and 'service' in data:
-                    service_name = data.get('service', '')
+                    service_name = str(data.get('service', ''))
                     if expected_service in service_name or 'library' in service_name:
                         print_success(f"Route {route} → {expected_service} service (HTTP 200)")
                         return True
@@ -78,41 +105,39 @@ def test_gateway_routing(route: str, expected_service: str) -> bool:
             except:
                 print_success(f"Route {route} → {expected_service} service (HTTP 200, non-JSON response)")
                 return True
-        elif response.status_code == 404:
+        elif status_code == 404:
             print_error(f"Route {route} not found (HTTP 404) - Check Gateway configuration")
             return False
-        elif response.status_code == 503:
+        elif status_code == 503:
             print_error(f"Route {route} service unavailable (HTTP 503) - Check {expected_service} service")
             return False
         else:
-            print_warning(f"Route {route} returned HTTP {response.status_code}")
+            print_warning(f"Route {route} returned HTTP {status_code}")
             return False
             
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         print_error(f"Route {route} failed: {str(e)}")
         return False
 
-def main():
-    print_header("PHASE 1 - TEST INTÉGRATION SERVICE LIBRARY")
+async def run_tests(client: httpx.AsyncClient) -> tuple[int, int]:
+    """Exécute tous les tests avec le client partagé ; retourne (tests passés, total)"""
     
     # Statistiques
     total_tests = 0
     passed_tests = 0
     
-    # Test 1: Health check direct du service library
+    # Test 1: Health check direct du service library et du gateway (en parallèle)
     print_header("1. HEALTH CHECK SERVICES")
     
-    print_info("Testing library service directly...")
-    total_tests += 1
-    if test_service_health(LIBRARY_SERVICE_URL, "Library Service"):
-        passed_tests += 1
-    
-    print_info("Testing API Gateway...")
-    total_tests += 1  
-    if test_service_health(GATEWAY_URL, "API Gateway"):
-        passed_tests += 1
+    print_info("Testing library service and API Gateway...")
+    health_results = await asyncio.gather(
+        test_service_health(client, LIBRARY_SERVICE_URL, "Library Service"),
+        test_service_health(client, GATEWAY_URL, "API Gateway"),
+    )
+    total_tests += len(health_results)
+    passed_tests += sum(health_results)
     
-    # Test 2: Routage via API Gateway
+    # Test 2: Routage via API Gateway (routes indépendantes, testées en parallèle)
     print_header("2. GATEWAY ROUTING TESTS")
     
     # Routes de base à tester
@@ -123,21 +148,23 @@ def main():
         ("/api/library/", "library"),  # Route library avec préfixe
     ]
     
-    for route, expected_service in test_routes:
-        total_tests += 1
-        if test_gateway_routing(route, expected_service):
-            passed_tests += 1
+    routing_results = await asyncio.gather(*(
+        test_gateway_routing(client, route, expected_service)
+        for route, expected_service in test_routes
+    ))
+    total_tests += len(routing_results)
+    passed_tests += sum(routing_results)
     
     # Test 3: Configuration Gateway
     print_header("3. GATEWAY CONFIGURATION CHECK")
     
     try:
         # Tester l'endpoint d'info du gateway
-        response = requests.get(f"{GATEWAY_URL}/", timeout=5)
+        response = await retry(lambda: client.get(f"{GATEWAY_URL}/", timeout=5))
         total_tests += 1
         
         if response.status_code == 200:
-            data = response.json()
+            data = orjson.loads(response.content)
             services = data.get('services_backend', [])
             
             if 'library' in services:
@@ -152,6 +179,18 @@ def main():
     except Exception as e:
         print_error(f"Gateway configuration test failed: {str(e)}")
     
+    return passed_tests, total_tests
+
+async def _amain() -> tuple[int, int]:
+    """Ouvre un seul client HTTP (pool de connexions keep-alive) pour toute la campagne"""
+    async with make_client(max_keepalive_connections=10, max_connections=50) as client:
+        return await run_tests(client)
+
+def main():
+    print_header("PHASE 1 - TEST INTÉGRATION SERVICE LIBRARY")
+    
+    passed_tests, total_tests = asyncio.run(_amain())
+    
     # Résultats finaux
     print_header("RÉSULTATS PHASE 1")
     